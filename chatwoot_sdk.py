@@ -1,5 +1,34 @@
+import csv
+import hashlib
+import heapq
+import inspect
+import json
+import mmap
+import sqlite3
+import struct
+import tempfile
+import threading
+import time
+import zlib
 import requests
 import os
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from requests.compat import json as complexjson
+from urllib.parse import parse_qsl, unquote, urlencode, urlsplit
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 
 # Disable SSL verification by manipulating environment variables
 # os.environ['REQUESTS_CA_BUNDLE'] = 'src/ca-cert.crt'
@@ -8,12 +37,18 @@ class ChatwootAPIError(Exception):
     pass
 
 class ChatwootSDK:
-    def __init__(self, base_url, platform_access_token, api_access_token):
+    def __init__(self, base_url, platform_access_token, api_access_token, profile=False, recorder=None, cache=None, conditional_cache_size=256):
         self.base_url = base_url
         self.headers = {
             'api_access_token': api_access_token,
             'Content-Type': 'application/json'
         }
+        # LRU of url?params -> (etag, last_modified, raw body) for conditional GETs; 0 disables
+        self.conditional_cache_size = conditional_cache_size
+        self._validators = OrderedDict()
+        self._validators_lock = threading.Lock()
+        # Optional CacheBackend shared by GETs; writes invalidate the touched resource
+        self.cache = cache
 
         self.platform_access_token = platform_access_token
         self.api_access_token = api_access_token
@@ -32,21 +67,126 @@ class ChatwootSDK:
         self.portals = self.Portals(self)
         self.reports = self.Reports(self)
 
+        # Opt-in per-call phase timings and traffic recording
+        self.profile = profile
+        self.recorder = recorder
+        self.timings = []
+        self._local = threading.local()
+        if profile or recorder:
+            self._instrument()
+
     def _send_request(self, method, endpoint, data=None, json=None, params=None):
+        started = time.perf_counter()
+        call = getattr(self._local, 'call', None)
         url = f"{self.base_url}{endpoint}"
+        # Per-request copy: the client is shared across threads by the exporter and replay
+        headers = dict(self.headers)
         if("public" == endpoint.split("/")[1]):
-            if("api_access_token" in self.headers):
-                del self.headers['api_access_token']
+            headers.pop('api_access_token', None)
         elif("api" == endpoint.split("/")[1]):
-            self.headers['api_access_token'] = self.api_access_token
+            headers['api_access_token'] = self.api_access_token
         elif("platform" == endpoint.split("/")[1]):
-            self.headers['api_access_token'] = self.platform_access_token
-        response = requests.request(method, url, headers=self.headers, data=data, json=json)
-
-        if response.status_code >= 400:
+            headers['api_access_token'] = self.platform_access_token
+        # Namespaced by a token fingerprint so workers sharing a cache never see another token's responses
+        fingerprint = hashlib.sha256(str(headers.get('api_access_token') or '').encode('utf-8')).hexdigest()[:16]
+        cache_key = f"{url}?{urlencode(sorted((params or {}).items()), doseq=True)}#{fingerprint}"
+        if self.cache is not None and method == 'GET':
+            hit = self.cache.get(cache_key)
+            if hit is not None:
+                # Hits never reach the server, so there is nothing for the recorder to
+                # capture; the profiler still logs them with zero transport time
+                if self.profile:
+                    self._record_timing(call, method, endpoint, started, cached=True, cache=time.perf_counter() - started)
+                return hit
+        cached = self._get_validators(cache_key) if method == 'GET' else None
+        if cached:
+            if cached[0]:
+                headers['If-None-Match'] = cached[0]
+            if cached[1]:
+                headers['If-Modified-Since'] = cached[1]
+        prepared = time.perf_counter()
+        # Encode here rather than via requests' json= so the cost shows up as its own phase
+        if json is not None:
+            data = complexjson.dumps(json, allow_nan=False).encode('utf-8')
+        encoded = time.perf_counter()
+        response = requests.request(method, url, headers=headers, data=data, params=params)
+        received = time.perf_counter()
+
+        if self.recorder:
+            self.recorder.record(call, method, endpoint, params, json, response)
+
+        if cached and response.status_code == 304:
+            # Decode the stored bytes each time so callers never share a mutable body
+            body = complexjson.loads(cached[2])
+        elif response.status_code >= 400:
             raise ChatwootAPIError(f"Error {response.status_code}: {response.text}")
-
-        return response.json()
+        else:
+            # Some endpoints (e.g. bulk_actions) answer with an empty `head :ok`
+            body = response.json() if response.content else None
+            if method == 'GET':
+                etag = response.headers.get('ETag')
+                last_modified = response.headers.get('Last-Modified')
+                if etag or last_modified:
+                    self._set_validators(cache_key, (etag, last_modified, response.content))
+
+        if self.cache is not None:
+            if method == 'GET':
+                self.cache.set(cache_key, body)
+            else:
+                self.cache.invalidate(f"{self.base_url}{_invalidation_prefix(endpoint)}")
+
+        if self.profile:
+            self._record_timing(call, method, endpoint, started, prepare=prepared - started, encode=encoded - prepared, transport=received - encoded, decode=time.perf_counter() - received)
+        return body
+
+    def _record_timing(self, call, method, endpoint, started, cached=False, **phases):
+        timing = {
+            'call': f'{call[0]}.{call[1]}' if call else None,
+            'method': method,
+            'endpoint': endpoint,
+            'cached': cached,
+            'build': started - call[4] if call else 0.0,
+            'prepare': 0.0,
+            'encode': 0.0,
+            'transport': 0.0,
+            'decode': 0.0,
+            'cache': 0.0
+        }
+        timing.update(phases)
+        self.timings.append(timing)
+
+    def _get_validators(self, cache_key):
+        with self._validators_lock:
+            cached = self._validators.get(cache_key)
+            if cached:
+                self._validators.move_to_end(cache_key)
+            return cached
+
+    def _set_validators(self, cache_key, validators):
+        if not self.conditional_cache_size:
+            return
+        with self._validators_lock:
+            self._validators[cache_key] = validators
+            self._validators.move_to_end(cache_key)
+            while len(self._validators) > self.conditional_cache_size:
+                self._validators.popitem(last=False)
+
+    def _instrument(self):
+        for resource_name, resource in list(vars(self).items()):
+            if getattr(resource, 'client', None) is not self:
+                continue
+            for name in dir(type(resource)):
+                if not name.startswith('_'):
+                    setattr(resource, name, self._instrumented(resource_name, name, getattr(resource, name)))
+
+    def _instrumented(self, resource_name, name, method):
+        def call(*args, **kwargs):
+            self._local.call = (resource_name, name, args, kwargs, time.perf_counter(), method)
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self._local.call = None
+        return call
 
     class Accounts:
         def __init__(self, client):
@@ -394,6 +534,19 @@ class ChatwootSDK:
                 data['team_id'] = team_id
             return self.client._send_request('POST', f'/api/v1/accounts/{account_id}/conversations/{conversation_id}/assignments', json=data)
 
+        def bulk_assign(self, account_id, conversation_ids, assignee_id=None, team_id=None):
+            fields = {}
+            if assignee_id:
+                fields['assignee_id'] = assignee_id
+            if team_id:
+                fields['team_id'] = team_id
+            data = {
+                'type': 'Conversation',
+                'ids': conversation_ids,
+                'fields': fields
+            }
+            return self.client._send_request('POST', f'/api/v1/accounts/{account_id}/bulk_actions', json=data)
+
         def list_labels(self, account_id, conversation_id):
             return self.client._send_request('GET', f'/api/v1/accounts/{account_id}/conversations/{conversation_id}/labels')
 
@@ -424,8 +577,11 @@ class ChatwootSDK:
             }
             return self.client._send_request('PATCH', f'/public/api/v1/inboxes/{inbox_identifier}/contacts/{contact_identifier}/conversations/{conversation_id}/messages/{message_id}', json=data)
 
-        def list_all(self, account_id, conversation_id):
-            return self.client._send_request('GET', f'/api/v1/accounts/{account_id}/conversations/{conversation_id}/messages')
+        def list_all(self, account_id, conversation_id, before=None):
+            params = {}
+            if before:
+                params['before'] = before
+            return self.client._send_request('GET', f'/api/v1/accounts/{account_id}/conversations/{conversation_id}/messages', params=params)
 
         def create_message(self, account_id, conversation_id, content, message_type='outgoing', private=False, content_type=None, content_attributes=None, attachment_blob=None, sender_type=None, sender_id=None):
             data = {
@@ -767,3 +923,688 @@ class ChatwootSDK:
 
         def get_agent_conversation_metrics(self, account_id, user_id):
             return self.client._send_request('GET', f'/api/v2/accounts/{account_id}/reports/conversations/', params={'type': 'agent', 'user_id': user_id})
+
+
+class AssignmentEngine:
+    # Safe to feed from web-server threads: state is guarded by self.lock,
+    # which is released while bulk assignments are in flight
+    def __init__(self, client, account_id, batch_size=25):
+        self.client = client
+        self.account_id = account_id
+        self.batch_size = batch_size
+        self.lock = threading.RLock()
+        self.load = {}
+        self.assignees = {}
+        self.pending = {}
+        self.team_members = {}
+        self.inbox_members = {}
+        # pool key -> heap of (load, agent_id); stale entries are skipped on pop
+        # and the heap is rebuilt once it outgrows its members
+        self._heaps = {}
+        self._pool_members = {}
+        self._pools = {}
+
+    def load_team(self, team_id):
+        members = self.client.teams.list_members(self.account_id, team_id)
+        with self.lock:
+            self.team_members[team_id] = self._member_ids(members)
+            self._set_pool(('team', team_id), self.team_members[team_id])
+            self._drop_combined_pools(lambda pool: pool[1] == team_id)
+
+    def load_inbox(self, inbox_id):
+        members = self.client.inboxes.list_members(self.account_id, inbox_id)
+        with self.lock:
+            self.inbox_members[inbox_id] = self._member_ids(members)
+            self._set_pool(('inbox', inbox_id), self.inbox_members[inbox_id])
+            self._drop_combined_pools(lambda pool: pool[2] == inbox_id)
+
+    def _member_ids(self, members):
+        if isinstance(members, dict):
+            members = members.get('payload', [])
+        return {member['id'] for member in members}
+
+    def _set_pool(self, pool, agent_ids):
+        for agent_id in self._pool_members.get(pool, set()) - agent_ids:
+            self._pools[agent_id].discard(pool)
+        self._pool_members[pool] = agent_ids
+        for agent_id in agent_ids:
+            self.load.setdefault(agent_id, 0)
+            self._pools.setdefault(agent_id, set()).add(pool)
+        self._rebuild(pool)
+
+    def _drop_combined_pools(self, affected):
+        for pool in [pool for pool in self._pool_members if pool[0] == 'team_inbox' and affected(pool)]:
+            for agent_id in self._pool_members.pop(pool):
+                self._pools[agent_id].discard(pool)
+            del self._heaps[pool]
+
+    def _rebuild(self, pool):
+        self._heaps[pool] = [(self.load[agent_id], agent_id) for agent_id in self._pool_members[pool]]
+        heapq.heapify(self._heaps[pool])
+
+    def _pool_for(self, inbox_id, team_id):
+        # Team and inbox membership both restrict eligibility when both are loaded
+        if team_id in self.team_members and inbox_id in self.inbox_members:
+            pool = ('team_inbox', team_id, inbox_id)
+            if pool not in self._pool_members:
+                self._set_pool(pool, self.team_members[team_id] & self.inbox_members[inbox_id])
+            return pool
+        if team_id in self.team_members:
+            return ('team', team_id)
+        return ('inbox', inbox_id)
+
+    def _set_load(self, agent_id, delta):
+        self.load[agent_id] = self.load.get(agent_id, 0) + delta
+        for pool in self._pools.get(agent_id, ()):
+            heap = self._heaps[pool]
+            heapq.heappush(heap, (self.load[agent_id], agent_id))
+            if len(heap) > 2 * len(self._pool_members[pool]) + 1:
+                self._rebuild(pool)
+
+    def _least_loaded(self, pool):
+        heap = self._heaps.get(pool)
+        while heap:
+            load, agent_id = heap[0]
+            if pool in self._pools.get(agent_id, ()) and self.load[agent_id] == load:
+                return agent_id
+            heapq.heappop(heap)
+        return None
+
+    def observe(self, conversation):
+        conversation_id = conversation['id']
+        meta = conversation.get('meta') or {}
+        assignee = meta.get('assignee') or {}
+        team = meta.get('team') or {}
+        assignee_id = assignee.get('id') or conversation.get('assignee_id')
+        team_id = team.get('id') or conversation.get('team_id')
+
+        with self.lock:
+            previous = self.assignees.pop(conversation_id, None)
+            if previous is not None:
+                self._set_load(previous, -1)
+            self.pending.pop(conversation_id, None)
+
+            if conversation.get('status', 'open') != 'open':
+                return
+            if assignee_id:
+                self.assignees[conversation_id] = assignee_id
+                self._set_load(assignee_id, 1)
+            else:
+                self.pending[conversation_id] = (conversation.get('inbox_id'), team_id)
+
+    def handle_webhook(self, payload):
+        if payload.get('event') in ('conversation_created', 'conversation_updated', 'conversation_status_changed'):
+            self.observe(payload)
+
+    def assign_pending(self):
+        # Picks are applied tentatively so later picks in the same pass see the
+        # new load; a batch the API rejects is rolled back into pending
+        planned = {}
+        batches = {}
+        with self.lock:
+            for conversation_id, (inbox_id, team_id) in list(self.pending.items()):
+                agent_id = self._least_loaded(self._pool_for(inbox_id, team_id))
+                if agent_id is None:
+                    continue
+                planned[conversation_id] = self.pending.pop(conversation_id)
+                self.assignees[conversation_id] = agent_id
+                self._set_load(agent_id, 1)
+                batches.setdefault(agent_id, []).append(conversation_id)
+
+        assigned = {}
+        for agent_id, conversation_ids in batches.items():
+            for i in range(0, len(conversation_ids), self.batch_size):
+                batch = conversation_ids[i:i + self.batch_size]
+                try:
+                    self.client.conversations.bulk_assign(self.account_id, batch, assignee_id=agent_id)
+                except (ChatwootAPIError, requests.RequestException):
+                    with self.lock:
+                        for conversation_id in batch:
+                            # Skip conversations a webhook has already moved on
+                            if self.assignees.get(conversation_id) != agent_id:
+                                continue
+                            del self.assignees[conversation_id]
+                            self._set_load(agent_id, -1)
+                            self.pending[conversation_id] = planned[conversation_id]
+                    continue
+                assigned.setdefault(agent_id, []).extend(batch)
+        return assigned
+
+
+def _flatten(value, prefix, out):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            _flatten(item, f'{prefix}.{key}' if prefix else key, out)
+    elif isinstance(value, list):
+        out[prefix] = json.dumps(value)
+    else:
+        out[prefix] = value
+    return out
+
+
+def _flatten_messages(conversation, messages):
+    base = _flatten(conversation, 'conversation', {})
+    return [_flatten(message, 'message', dict(base)) for message in messages]
+
+
+class _SpooledWriter:
+    # Rows are spooled to a temporary NDJSON file so the final column set and
+    # column types are known before anything is written; memory stays bounded
+    # by chunk_size when the spool is replayed into the output file
+    def __init__(self, path, chunk_size):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.spool = tempfile.TemporaryFile('w+')
+        self.types = {}
+
+    def write(self, rows):
+        for row in rows:
+            for key, value in row.items():
+                kinds = self.types.setdefault(key, set())
+                if value is not None:
+                    kinds.add(type(value))
+            self.spool.write(json.dumps(row) + '\n')
+
+    def _chunks(self):
+        self.spool.seek(0)
+        chunk = []
+        for line in self.spool:
+            chunk.append(json.loads(line))
+            if len(chunk) >= self.chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def close(self):
+        try:
+            self._finish()
+        finally:
+            self.spool.close()
+
+
+class _CSVWriter(_SpooledWriter):
+    def _finish(self):
+        with open(self.path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=sorted(self.types))
+            writer.writeheader()
+            for chunk in self._chunks():
+                writer.writerows(chunk)
+
+
+class _NDJSONWriter:
+    def __init__(self, path, chunk_size):
+        self.file = open(path, 'w')
+
+    def write(self, rows):
+        self.file.writelines(json.dumps(row) + '\n' for row in rows)
+
+    def close(self):
+        self.file.close()
+
+
+class _ParquetWriter(_SpooledWriter):
+    def _column_type(self, kinds):
+        if kinds == {bool}:
+            return pyarrow.bool_()
+        if kinds == {int}:
+            return pyarrow.int64()
+        if kinds and kinds <= {int, float}:
+            return pyarrow.float64()
+        # Empty and mixed columns fall back to strings
+        return pyarrow.string()
+
+    def _coerce(self, value, type):
+        if value is None:
+            return None
+        if pyarrow.types.is_string(type):
+            return value if isinstance(value, str) else json.dumps(value)
+        if pyarrow.types.is_floating(type):
+            return float(value)
+        return value
+
+    def _finish(self):
+        if not self.types:
+            return
+        schema = pyarrow.schema([(name, self._column_type(kinds)) for name, kinds in sorted(self.types.items())])
+        with pyarrow.parquet.ParquetWriter(self.path, schema) as writer:
+            for chunk in self._chunks():
+                columns = [[self._coerce(row.get(field.name), field.type) for row in chunk] for field in schema]
+                writer.write_table(pyarrow.Table.from_arrays(columns, schema=schema))
+
+
+class ConversationExporter:
+    writers = {
+        'csv': _CSVWriter,
+        'ndjson': _NDJSONWriter,
+        'parquet': _ParquetWriter
+    }
+
+    def __init__(self, client, account_id, path, format=None, status='all', threads=8, processes=None, chunk_size=50000, progress=None):
+        if format is None:
+            format = 'parquet' if pyarrow else 'csv'
+        if format == 'parquet' and pyarrow is None:
+            raise ImportError('pyarrow is required for parquet export')
+        self.client = client
+        self.account_id = account_id
+        self.path = path
+        self.format = format
+        self.status = status
+        self.threads = threads
+        self.processes = processes
+        self.chunk_size = chunk_size
+        self.progress = progress
+
+    def _conversation_pages(self):
+        page = 1
+        while True:
+            response = self.client.conversations.list_all(self.account_id, status=self.status, page=page)
+            conversations = response.get('data', {}).get('payload', [])
+            if not conversations:
+                return
+            yield conversations
+            page += 1
+
+    def _fetch_messages(self, conversation):
+        messages = []
+        before = None
+        while True:
+            payload = self.client.messages.list_all(self.account_id, conversation['id'], before=before).get('payload', [])
+            if not payload:
+                break
+            messages.extend(payload)
+            oldest = min(message['id'] for message in payload)
+            if before is not None and oldest >= before:
+                break
+            before = oldest
+        return conversation, messages
+
+    def run(self):
+        report = {'conversations': 0, 'messages': 0, 'seconds': 0.0, 'messages_per_second': 0.0}
+        started = time.monotonic()
+        writer = self.writers[self.format](self.path, self.chunk_size)
+        buffer = []
+        pending = []
+
+        def drain(limit):
+            while len(pending) > limit:
+                rows = pending.pop(0).result()
+                buffer.extend(rows)
+                report['messages'] += len(rows)
+                if len(buffer) >= self.chunk_size:
+                    flush()
+
+        def flush():
+            if buffer:
+                writer.write(buffer)
+                buffer.clear()
+            report['seconds'] = time.monotonic() - started
+            report['messages_per_second'] = report['messages'] / report['seconds'] if report['seconds'] else 0.0
+            if self.progress:
+                self.progress(dict(report))
+
+        try:
+            with ThreadPoolExecutor(self.threads) as fetchers, ProcessPoolExecutor(self.processes) as flatteners:
+                for conversations in self._conversation_pages():
+                    for conversation, messages in fetchers.map(self._fetch_messages, conversations):
+                        report['conversations'] += 1
+                        pending.append(flatteners.submit(_flatten_messages, conversation, messages))
+                    # Bound memory to a few pages of in-flight flattening work
+                    drain(self.threads * 4)
+                drain(0)
+                flush()
+        finally:
+            writer.close()
+        return report
+
+
+def _is_secret(name):
+    return any(word in name.lower() for word in TrafficRecorder.redacted_keys)
+
+
+def _redact(value, secrets=()):
+    if isinstance(value, dict):
+        return {key: '[REDACTED]' if _is_secret(key) else _redact(item, secrets) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_redact(item, secrets) for item in value]
+    if isinstance(value, str) and value in secrets:
+        return '[REDACTED]'
+    return value
+
+
+def _request_key(method, endpoint, params):
+    return (method, endpoint.rstrip('/'), repr(sorted((key, str(value)) for key, value in (params or {}).items())))
+
+
+class TrafficRecorder:
+    # Matched as substrings of argument and payload key names; identifiers
+    # double as credentials on the public inbox API
+    redacted_keys = ('token', 'password', 'secret', 'hash', 'identifier')
+
+    def __init__(self, path):
+        self.file = open(path, 'a')
+        self.lock = threading.Lock()
+        self.errors = 0
+
+    def record(self, call, method, endpoint, params, json_body, response):
+        # Never let recording break the real call path
+        try:
+            self._record(call, method, endpoint, params, json_body, response)
+        except Exception:
+            with self.lock:
+                self.errors += 1
+
+    def _record(self, call, method, endpoint, params, json_body, response):
+        recorded_call = None
+        secrets = ()
+        if call:
+            # Bind positional args to parameter names so they are redacted like keywords;
+            # string secrets are also replaced where they reappear verbatim as a whole
+            # path segment or string value (never as substrings, which would mangle
+            # timestamps and ids when identifiers are short)
+            arguments = inspect.signature(call[5]).bind(*call[2], **call[3]).arguments
+            secrets = {value for name, value in arguments.items() if _is_secret(name) and isinstance(value, str) and value}
+            endpoint = '/'.join('[REDACTED]' if segment in secrets else segment for segment in endpoint.split('/'))
+            recorded_call = [call[0], call[1], [], _redact(dict(arguments), secrets)]
+        try:
+            body = _redact(response.json(), secrets)
+        except ValueError:
+            body = _redact(response.text, secrets)
+        # Request headers are never written, so access tokens stay out of the file
+        entry = {
+            'call': recorded_call,
+            'method': method,
+            'endpoint': endpoint,
+            'params': _redact(params, secrets),
+            'json': _redact(json_body, secrets),
+            'status': response.status_code,
+            'headers': {key: response.headers[key] for key in ('Content-Type', 'ETag', 'Last-Modified') if key in response.headers},
+            'body': body
+        }
+        line = json.dumps(entry, default=repr) + '\n'
+        with self.lock:
+            self.file.write(line)
+            self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class _ReplayHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _respond(self):
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        url = urlsplit(self.path)
+        entry = self.server.responses.get(_request_key(self.command, unquote(url.path), dict(parse_qsl(url.query))))
+        if entry is None:
+            status, headers, body = 404, {}, '{"error": "not recorded"}'
+        else:
+            status, headers = entry['status'], entry['headers']
+            body = entry['body'] if isinstance(entry['body'], str) else json.dumps(entry['body'])
+            if 'ETag' in headers and self.headers.get('If-None-Match') == headers['ETag']:
+                status, body = 304, ''
+        body = body.encode('utf-8')
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _respond
+
+
+def replay(path, concurrency=8, repeat=1):
+    with open(path) as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _ReplayHandler)
+    server.daemon_threads = True
+    server.responses = {_request_key(entry['method'], entry['endpoint'], entry['params']): entry for entry in entries if entry['status'] != 304}
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    client = ChatwootSDK(f'http://127.0.0.1:{server.server_address[1]}', 'replay', 'replay', profile=True)
+
+    def run(entry):
+        started = time.perf_counter()
+        try:
+            if entry['call']:
+                resource_name, name, args, kwargs = entry['call']
+                getattr(getattr(client, resource_name), name)(*args, **kwargs)
+            else:
+                client._send_request(entry['method'], entry['endpoint'], json=entry['json'], params=entry['params'])
+        except ChatwootAPIError:
+            pass
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(concurrency) as pool:
+            latencies = sorted(pool.map(run, entries * repeat))
+    finally:
+        server.shutdown()
+        server.server_close()
+    seconds = time.perf_counter() - started
+
+    phases = ('build', 'prepare', 'encode', 'transport', 'decode')
+    count = len(latencies)
+    return {
+        'calls': count,
+        'concurrency': concurrency,
+        'seconds': seconds,
+        'calls_per_second': count / seconds if seconds else 0.0,
+        'p50': latencies[count // 2] if count else 0.0,
+        'p99': latencies[min(count - 1, int(count * 0.99))] if count else 0.0,
+        'phases': {phase: sum(timing[phase] for timing in client.timings) / len(client.timings) if client.timings else 0.0 for phase in phases}
+    }
+
+
+def _invalidation_prefix(endpoint):
+    # A write invalidates every cached GET under the resource it touched,
+    # e.g. PATCH .../accounts/1/teams/3 drops .../accounts/1/teams and below
+    parts = endpoint.strip('/').split('/')
+    if 'accounts' in parts:
+        i = parts.index('accounts')
+        depth = i + 2 if parts[i + 2:i + 3] == ['bulk_actions'] else i + 3
+    else:
+        depth = 5 if parts[0] == 'public' else 4
+    return '/' + '/'.join(parts[:depth])
+
+
+def _matches_prefix(key, prefix):
+    # Keys look like {url}?{query}#{token fingerprint}, so the query separator always follows the path
+    return key.startswith(prefix) and key[len(prefix):len(prefix) + 1] in ('', '/', '?')
+
+
+class CacheBackend:
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value):
+        raise NotImplementedError
+
+    def invalidate(self, prefix):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class LRUCache(CacheBackend):
+    def __init__(self, max_entries=1024, ttl=60):
+        super().__init__(ttl)
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            value = entry[1]
+        # Stored serialized so every hit hands out a fresh object
+        return json.loads(value)
+
+    def set(self, key, value):
+        value = json.dumps(value)
+        with self.lock:
+            self.entries[key] = (time.time() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, prefix):
+        with self.lock:
+            for key in [key for key in self.entries if _matches_prefix(key, prefix)]:
+                del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class SQLiteCache(CacheBackend):
+    def __init__(self, path, max_entries=10000, ttl=60):
+        super().__init__(ttl)
+        self.path = path
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self._pid = None
+        self._conn = None
+
+    @property
+    def conn(self):
+        # Reconnect after fork; sqlite connections must not cross processes
+        if self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.execute('CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)')
+            self._pid = os.getpid()
+        return self._conn
+
+    def get(self, key):
+        with self.lock:
+            row = self.conn.execute('SELECT value FROM cache WHERE key = ? AND expires >= ?', (key, time.time())).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, value):
+        now = time.time()
+        with self.lock:
+            conn = self.conn
+            conn.execute('INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)', (key, json.dumps(value), now + self.ttl))
+            conn.execute('DELETE FROM cache WHERE expires < ?', (now,))
+            conn.execute('DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY expires DESC LIMIT -1 OFFSET ?)', (self.max_entries,))
+
+    def invalidate(self, prefix):
+        with self.lock:
+            self.conn.execute("DELETE FROM cache WHERE substr(key, 1, ?) = ? AND substr(key, ? + 1, 1) IN ('', '/', '?')", (len(prefix), prefix, len(prefix)))
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute('DELETE FROM cache')
+
+
+class MmapCache(CacheBackend):
+    # Direct-mapped table of fixed-size slots in a shared file:
+    # expires (double), key length, value length, key bytes, value bytes
+    slot_header = struct.Struct('<dII')
+
+    def __init__(self, path, slots=1024, slot_size=65536, ttl=60):
+        super().__init__(ttl)
+        self.path = path
+        self.slots = slots
+        self.slot_size = slot_size
+        self.lock = threading.Lock()
+        self._pid = None
+        self.file = None
+        self.segment = None
+        # Create without truncating: workers start concurrently, and cutting a file
+        # another process has mapped would SIGBUS it; only ever grow the file
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            if os.fstat(fd).st_size < slots * slot_size:
+                os.ftruncate(fd, slots * slot_size)
+        finally:
+            os.close(fd)
+
+    def _open(self):
+        # Reopen after fork: flock is held per open file description, so a
+        # descriptor inherited from the parent would not exclude other workers
+        if self._pid != os.getpid():
+            self.file = open(self.path, 'r+b')
+            self.segment = mmap.mmap(self.file.fileno(), self.slots * self.slot_size)
+            self._pid = os.getpid()
+
+    @contextmanager
+    def _locked(self, exclusive):
+        # Thread lock within the process, flock across processes sharing the file
+        with self.lock:
+            self._open()
+            if fcntl:
+                fcntl.flock(self.file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(self.file, fcntl.LOCK_UN)
+
+    def _slot(self, key):
+        return (zlib.crc32(key) % self.slots) * self.slot_size
+
+    def _read(self, offset):
+        expires, key_length, value_length = self.slot_header.unpack_from(self.segment, offset)
+        start = offset + self.slot_header.size
+        return expires, self.segment[start:start + key_length], start + key_length, value_length
+
+    def get(self, key):
+        key = key.encode('utf-8')
+        with self._locked(False):
+            expires, stored_key, start, value_length = self._read(self._slot(key))
+            if stored_key != key or expires < time.time():
+                return None
+            value = self.segment[start:start + value_length]
+        return json.loads(value)
+
+    def set(self, key, value):
+        key = key.encode('utf-8')
+        value = json.dumps(value).encode('utf-8')
+        if self.slot_header.size + len(key) + len(value) > self.slot_size:
+            return
+        offset = self._slot(key)
+        with self._locked(True):
+            self.slot_header.pack_into(self.segment, offset, time.time() + self.ttl, len(key), len(value))
+            start = offset + self.slot_header.size
+            self.segment[start:start + len(key) + len(value)] = key + value
+
+    def invalidate(self, prefix):
+        with self._locked(True):
+            for offset in range(0, self.slots * self.slot_size, self.slot_size):
+                expires, stored_key, _, _ = self._read(offset)
+                if expires and _matches_prefix(stored_key.decode('utf-8'), prefix):
+                    self.slot_header.pack_into(self.segment, offset, 0.0, 0, 0)
+
+    def clear(self):
+        with self._locked(True):
+            for offset in range(0, self.slots * self.slot_size, self.slot_size):
+                self.slot_header.pack_into(self.segment, offset, 0.0, 0, 0)
+
+    def close(self):
+        if self._pid == os.getpid():
+            self.segment.close()
+            self.file.close()
+        self._pid = None
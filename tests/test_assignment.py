@@ -0,0 +1,127 @@
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from chatwoot_sdk import AssignmentEngine, ChatwootSDK
+
+
+def make_engine(standin, bulk_status=200):
+    def route(request):
+        if request['path'].endswith('/team_members'):
+            return 200, {}, [{'id': 1}, {'id': 2}, {'id': 3}]
+        if request['path'].endswith('/bulk_actions'):
+            return bulk_status, {}, None
+        return 404, {}, {}
+
+    server = standin(route)
+    engine = AssignmentEngine(ChatwootSDK(server.url, 'platform', 'api'), 1)
+    engine.load_team(10)
+    return server, engine
+
+
+def open_conversation(conversation_id, assignee_id=None):
+    meta = {'team': {'id': 10}}
+    if assignee_id:
+        meta['assignee'] = {'id': assignee_id}
+    return {'event': 'conversation_created', 'id': conversation_id, 'status': 'open', 'inbox_id': 5, 'meta': meta}
+
+
+def test_assigns_least_loaded_agent_through_bulk_actions(standin):
+    server, engine = make_engine(standin)
+    engine.handle_webhook(open_conversation(100, assignee_id=1))
+    engine.handle_webhook(open_conversation(101, assignee_id=1))
+    engine.handle_webhook(open_conversation(102, assignee_id=2))
+    engine.handle_webhook(open_conversation(200))
+    engine.handle_webhook(open_conversation(201))
+
+    assert engine.assign_pending() == {3: [200], 2: [201]}
+    assert engine.load == {1: 2, 2: 2, 3: 1}
+    assert not engine.pending
+
+    bulk = [request['json'] for request in server.requests if request['path'].endswith('/bulk_actions')]
+    assert bulk == [
+        {'type': 'Conversation', 'ids': [200], 'fields': {'assignee_id': 3}},
+        {'type': 'Conversation', 'ids': [201], 'fields': {'assignee_id': 2}}
+    ]
+
+
+def test_resolved_conversation_releases_load(standin):
+    _, engine = make_engine(standin)
+    engine.observe({'id': 100, 'status': 'open', 'meta': {'assignee': {'id': 1}}})
+    engine.observe({'id': 100, 'status': 'resolved'})
+
+    assert engine.load[1] == 0
+    assert engine._least_loaded(('team', 10)) in (1, 2, 3)
+
+
+def test_failed_batch_is_rolled_back_into_pending(standin):
+    _, engine = make_engine(standin, bulk_status=500)
+    engine.handle_webhook(open_conversation(11))
+
+    assert engine.assign_pending() == {}
+    assert list(engine.pending) == [11]
+    assert engine.assignees == {}
+    assert engine.load == {1: 0, 2: 0, 3: 0}
+
+
+@pytest.mark.parametrize('status', [200, 204])
+def test_empty_bulk_actions_response(standin, status):
+    _, engine = make_engine(standin, bulk_status=status)
+    engine.handle_webhook(open_conversation(11))
+
+    assert sum(len(ids) for ids in engine.assign_pending().values()) == 1
+    assert not engine.pending
+
+
+def test_heaps_are_compacted_under_churn(standin):
+    _, engine = make_engine(standin)
+    for conversation_id in range(10000):
+        engine.observe({'id': conversation_id, 'status': 'open', 'meta': {'assignee': {'id': conversation_id % 3 + 1}}})
+        engine.observe({'id': conversation_id, 'status': 'resolved'})
+
+    assert engine.load == {1: 0, 2: 0, 3: 0}
+    assert len(engine._heaps[('team', 10)]) <= 2 * 3 + 1
+
+
+def test_team_and_inbox_membership_are_intersected(standin):
+    def route(request):
+        if request['path'].endswith('/team_members'):
+            return 200, {}, [{'id': 1}, {'id': 2}, {'id': 3}]
+        if '/inbox_members/' in request['path']:
+            return 200, {}, {'payload': [{'id': 2}, {'id': 3}, {'id': 4}]}
+        return 200, {}, None
+
+    engine = AssignmentEngine(ChatwootSDK(standin(route).url, 'platform', 'api'), 1)
+    engine.load_team(10)
+    engine.load_inbox(5)
+    engine.observe({'id': 100, 'status': 'open', 'meta': {'assignee': {'id': 2}}})
+    for conversation_id in (200, 201, 202):
+        engine.handle_webhook(open_conversation(conversation_id))
+
+    assigned = engine.assign_pending()
+
+    # Agent 1 is not in the inbox and agent 4 is not in the team
+    assert set(assigned) == {2, 3}
+    assert engine.load[1] == 0 and engine.load[4] == 0
+    assert engine.load[2] == engine.load[3] == 2
+
+
+def test_concurrent_webhooks_keep_load_consistent(standin):
+    _, engine = make_engine(standin)
+
+    def feed(offset):
+        for conversation_id in range(offset, offset + 200):
+            engine.handle_webhook(open_conversation(conversation_id))
+            if conversation_id % 3 == 0:
+                engine.handle_webhook({'event': 'conversation_status_changed', 'id': conversation_id, 'status': 'resolved'})
+
+    with ThreadPoolExecutor(4) as pool:
+        futures = [pool.submit(feed, offset) for offset in range(0, 800, 200)]
+        while not all(future.done() for future in futures):
+            engine.assign_pending()
+    engine.assign_pending()
+
+    counts = Counter(engine.assignees.values())
+    assert engine.load == {agent_id: counts.get(agent_id, 0) for agent_id in (1, 2, 3)}
+    assert not engine.pending
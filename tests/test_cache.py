@@ -0,0 +1,141 @@
+import fcntl
+import multiprocessing
+import os
+import time
+
+import pytest
+
+from chatwoot_sdk import ChatwootSDK, LRUCache, MmapCache, SQLiteCache, _invalidation_prefix
+
+
+def per_token_route(request):
+    if request['method'] != 'GET':
+        return 200, {}, {}
+    return 200, {}, {'token': request['headers'].get('api_access_token'), 'path': request['path']}
+
+
+BACKENDS = {
+    'lru': lambda tmp_path: LRUCache(),
+    'sqlite': lambda tmp_path: SQLiteCache(str(tmp_path / 'cache.db')),
+    # Direct-mapped: plenty of (sparse) slots keeps the handful of test keys from colliding
+    'mmap': lambda tmp_path: MmapCache(str(tmp_path / 'cache.mmap'), slots=65521, slot_size=512)
+}
+
+
+def gets(server):
+    return [request['path'] for request in server.requests if request['method'] == 'GET']
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_cache_is_namespaced_by_token(standin, tmp_path, backend):
+    server = standin(per_token_route)
+    cache = BACKENDS[backend](tmp_path)
+    a = ChatwootSDK(server.url, 'platform', 'tokA', cache=cache)
+    b = ChatwootSDK(server.url, 'platform', 'tokB', cache=cache)
+
+    assert a.conversations.list_all(1)['token'] == 'tokA'
+    assert b.conversations.list_all(1)['token'] == 'tokB'
+    assert a.conversations.list_all(1)['token'] == 'tokA'
+    assert len(gets(server)) == 2
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_write_invalidates_touched_resource_for_every_token(standin, tmp_path, backend):
+    server = standin(per_token_route)
+    cache = BACKENDS[backend](tmp_path)
+    a = ChatwootSDK(server.url, 'platform', 'tokA', cache=cache)
+    b = ChatwootSDK(server.url, 'platform', 'tokB', cache=cache)
+    for client in (a, b):
+        client.teams.list(1)
+        client.inboxes.list(1)
+
+    b.teams.update(1, 3, name='renamed')
+    a.teams.list(1)
+    a.inboxes.list(1)
+
+    assert gets(server).count('/api/v1/accounts/1/teams') == 3
+    assert gets(server).count('/api/v1/accounts/1/inboxes') == 2
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_mutating_a_hit_does_not_corrupt_the_cache(standin, tmp_path, backend):
+    server = standin(per_token_route)
+    client = ChatwootSDK(server.url, 'platform', 'api', cache=BACKENDS[backend](tmp_path))
+
+    client.teams.list(1)
+    client.teams.list(1).clear()
+
+    assert client.teams.list(1)['token'] == 'api'
+    assert len(gets(server)) == 1
+
+
+def test_mmap_construction_never_truncates_or_shrinks(tmp_path):
+    path = str(tmp_path / 'cache.mmap')
+    cache = MmapCache(path, slots=16, slot_size=1024)
+    cache.set('k', {'v': 1})
+
+    # Workers starting later, including ones configured smaller, only ever grow the file
+    for slots in (16, 4, 32):
+        MmapCache(path, slots=slots, slot_size=1024)
+
+    assert os.path.getsize(path) == 32 * 1024
+    assert cache.get('k') == {'v': 1}
+
+
+def test_ttl_expires_entries():
+    cache = LRUCache(ttl=0.05)
+    cache.set('k', {'v': 1})
+    assert cache.get('k') == {'v': 1}
+    time.sleep(0.1)
+    assert cache.get('k') is None
+
+
+def test_invalidation_prefix():
+    assert _invalidation_prefix('/api/v1/accounts/1/teams/3/team_members') == '/api/v1/accounts/1/teams'
+    assert _invalidation_prefix('/api/v1/accounts/1/bulk_actions') == '/api/v1/accounts/1'
+    assert _invalidation_prefix('/public/api/v1/inboxes/abc/contacts/c') == '/public/api/v1/inboxes/abc'
+
+
+def _warm_child(backend, tmp_path, url):
+    ChatwootSDK(url, 'platform', 'api', cache=BACKENDS[backend](tmp_path)).teams.list(1)
+
+
+@pytest.mark.parametrize('backend', ['sqlite', 'mmap'])
+def test_cache_is_shared_and_invalidated_across_processes(standin, tmp_path, backend):
+    server = standin(per_token_route)
+    context = multiprocessing.get_context('fork')
+    child = context.Process(target=_warm_child, args=(backend, tmp_path, server.url))
+    child.start()
+    child.join()
+
+    client = ChatwootSDK(server.url, 'platform', 'api', cache=BACKENDS[backend](tmp_path))
+    client.teams.list(1)
+    assert len(gets(server)) == 1
+
+    child = context.Process(target=lambda: ChatwootSDK(server.url, 'platform', 'api', cache=BACKENDS[backend](tmp_path)).teams.update(1, 3, name='x'))
+    child.start()
+    child.join()
+    client.teams.list(1)
+    assert len(gets(server)) == 2
+
+
+def _try_lock(cache, result):
+    # The parent forked while holding its thread lock, so open directly
+    cache._open()
+    try:
+        fcntl.flock(cache.file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        result.put('acquired')
+    except BlockingIOError:
+        result.put('blocked')
+
+
+def test_mmap_lock_excludes_forked_workers(tmp_path):
+    cache = MmapCache(str(tmp_path / 'cache.mmap'), slots=4, slot_size=1024)
+    cache.set('k', 1)
+    context = multiprocessing.get_context('fork')
+    result = context.Queue()
+    with cache._locked(True):
+        child = context.Process(target=_try_lock, args=(cache, result))
+        child.start()
+        child.join()
+    assert result.get() == 'blocked'
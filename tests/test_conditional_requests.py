@@ -0,0 +1,83 @@
+import gzip
+import json
+
+from chatwoot_sdk import ChatwootSDK
+
+ETAG = '"v1"'
+
+
+def etag_route(request):
+    if request['headers'].get('If-None-Match') == ETAG:
+        return 304, {'ETag': ETAG}, None
+    return 200, {'ETag': ETAG}, {'payload': [{'id': 1}]}
+
+
+def test_revalidates_and_serves_cached_body_on_304(standin):
+    server = standin(etag_route)
+    client = ChatwootSDK(server.url, 'platform', 'api')
+
+    assert client.teams.list(1) == {'payload': [{'id': 1}]}
+    assert client.teams.list(1) == {'payload': [{'id': 1}]}
+
+    assert 'If-None-Match' not in server.requests[0]['headers']
+    assert server.requests[1]['headers']['If-None-Match'] == ETAG
+
+
+def bytes_on_wire(standin, conditional, compress, calls=10):
+    payload = json.dumps({'payload': [{'id': i, 'name': f'portal {i}', 'slug': f'slug-{i}'} for i in range(500)]}).encode('utf-8')
+    sent = []
+
+    def route(request):
+        if conditional and request['headers'].get('If-None-Match') == ETAG:
+            return 304, {'ETag': ETAG}, None
+        headers = {'ETag': ETAG} if conditional else {}
+        body = payload
+        if compress and 'gzip' in request['headers'].get('Accept-Encoding', ''):
+            body = gzip.compress(payload)
+            headers['Content-Encoding'] = 'gzip'
+        sent.append(len(body))
+        return 200, headers, body
+
+    client = ChatwootSDK(standin(route).url, 'platform', 'api')
+    for _ in range(calls):
+        assert len(client.portals.list(1)['payload']) == 500
+    return sum(sent)
+
+
+def test_conditional_requests_cut_bytes_on_wire(standin):
+    # Bytes-on-wire measurement against the stand-in: only the first of ten
+    # calls carries a body once validators are sent back
+    for compress in (False, True):
+        unconditional = bytes_on_wire(standin, conditional=False, compress=compress)
+        conditional = bytes_on_wire(standin, conditional=True, compress=compress)
+        assert conditional * 10 == unconditional
+
+
+def test_mutating_a_result_does_not_corrupt_later_304s(standin):
+    server = standin(etag_route)
+    client = ChatwootSDK(server.url, 'platform', 'api')
+
+    client.teams.list(1)['payload'].clear()
+    assert client.teams.list(1) == {'payload': [{'id': 1}]}
+
+
+def test_validators_are_bounded_lru(standin):
+    server = standin(etag_route)
+    client = ChatwootSDK(server.url, 'platform', 'api', conditional_cache_size=2)
+
+    for team_id in (1, 2, 3):
+        client.teams.get(1, team_id)
+
+    assert len(client._validators) == 2
+    assert not any('/teams/1?' in key for key in client._validators)
+
+
+def test_validators_can_be_disabled(standin):
+    server = standin(etag_route)
+    client = ChatwootSDK(server.url, 'platform', 'api', conditional_cache_size=0)
+
+    client.teams.list(1)
+    client.teams.list(1)
+
+    assert not client._validators
+    assert 'If-None-Match' not in server.requests[1]['headers']
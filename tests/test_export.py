@@ -0,0 +1,67 @@
+import csv
+import json
+
+import pytest
+
+from chatwoot_sdk import ChatwootSDK, ConversationExporter, _CSVWriter, _ParquetWriter
+
+
+def export_route(request):
+    path = request['path']
+    if path.endswith('/conversations'):
+        page = int(request['query']['page'])
+        if page > 2:
+            return 200, {}, {'data': {'payload': []}}
+        # Page 2 introduces a custom attribute and fills a previously-null column
+        conversation = {'id': page, 'status': 'open', 'custom_attributes': {'x': 7} if page == 2 else {}, 'priority': 3 if page == 2 else None}
+        return 200, {}, {'data': {'payload': [conversation]}}
+    before = int(request['query'].get('before', 21))
+    return 200, {}, {'payload': [{'id': i, 'content': 'hi'} for i in range(max(1, before - 10), before)]}
+
+
+@pytest.mark.parametrize('format', ['csv', 'ndjson'])
+def test_export_paginates_messages_and_keeps_drifting_columns(standin, tmp_path, format):
+    server = standin(export_route)
+    path = tmp_path / f'out.{format}'
+    reports = []
+
+    report = ConversationExporter(ChatwootSDK(server.url, 'platform', 'api'), 1, str(path), format=format, threads=2, processes=1, chunk_size=5, progress=reports.append).run()
+
+    assert report['conversations'] == 2
+    assert report['messages'] == 40
+    assert reports
+    if format == 'csv':
+        with open(path, newline='') as f:
+            rows = list(csv.DictReader(f))
+    else:
+        with open(path) as f:
+            rows = [json.loads(line) for line in f]
+    assert len(rows) == 40
+    assert ('7' if format == 'csv' else 7) in {row.get('conversation.custom_attributes.x') for row in rows}
+
+
+def test_csv_writer_keeps_columns_first_seen_in_later_chunks(tmp_path):
+    path = tmp_path / 'out.csv'
+    writer = _CSVWriter(str(path), chunk_size=1)
+    writer.write([{'a': 1}])
+    writer.write([{'a': 2, 'custom.x': 'late'}])
+    writer.close()
+
+    with open(path, newline='') as f:
+        rows = list(csv.DictReader(f))
+    assert rows == [{'a': '1', 'custom.x': ''}, {'a': '2', 'custom.x': 'late'}]
+
+
+def test_parquet_writer_handles_drift_and_late_types(tmp_path):
+    pyarrow_parquet = pytest.importorskip('pyarrow.parquet')
+    path = tmp_path / 'out.parquet'
+    writer = _ParquetWriter(str(path), chunk_size=1)
+    writer.write([{'a': 1, 'flag': None, 'mixed': 1}])
+    writer.write([{'a': 2, 'flag': True, 'mixed': 'x', 'custom.x': 1.5}])
+    writer.close()
+
+    table = pyarrow_parquet.read_table(path)
+    assert table.to_pylist() == [
+        {'a': 1, 'custom.x': None, 'flag': None, 'mixed': '1'},
+        {'a': 2, 'custom.x': 1.5, 'flag': True, 'mixed': 'x'}
+    ]
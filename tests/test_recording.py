@@ -0,0 +1,112 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from chatwoot_sdk import ChatwootSDK, LRUCache, TrafficRecorder, replay
+
+
+def echo_route(request):
+    # Echo the last path segment back whole, as Chatwoot does with source/contact identifiers
+    return 200, {'Content-Type': 'application/json'}, {'id': 7, 'pubsub_token': 'live-token', 'source_id': request['path'].rsplit('/', 1)[-1], 'created': '2024-01-15 10:51'}
+
+
+def read_entries(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_profile_records_phase_timings(standin):
+    server = standin(echo_route)
+    client = ChatwootSDK(server.url, 'platform', 'api', profile=True)
+
+    client.inboxes.create(1, 'web', 'api', website_url='http://example.com')
+
+    timing, = client.timings
+    assert timing['call'] == 'inboxes.create'
+    assert set(timing) >= {'build', 'prepare', 'encode', 'transport', 'decode'}
+
+
+def test_recorder_redacts_positional_arguments_and_path_identifiers(standin, tmp_path):
+    server = standin(echo_route)
+    path = tmp_path / 'traffic.ndjson'
+    recorder = TrafficRecorder(str(path))
+    client = ChatwootSDK(server.url, 'platform-secret', 'api-secret', recorder=recorder)
+
+    client.users.create('n', 'e@x', 'hunter2')
+    client.contacts.get('inbox-ident', 'contact-ident')
+    recorder.close()
+
+    text = path.read_text()
+    for secret in ('hunter2', 'inbox-ident', 'contact-ident', 'live-token', 'platform-secret', 'api-secret'):
+        assert secret not in text
+    users, contacts = read_entries(path)
+    assert users['call'] == ['users', 'create', [], {'name': 'n', 'email': 'e@x', 'password': '[REDACTED]'}]
+    assert contacts['endpoint'] == '/public/api/v1/inboxes/[REDACTED]/contacts/[REDACTED]'
+
+
+def test_short_numeric_identifiers_do_not_mangle_recordings(standin, tmp_path):
+    server = standin(echo_route)
+    path = tmp_path / 'traffic.ndjson'
+    recorder = TrafficRecorder(str(path))
+    client = ChatwootSDK(server.url, 'platform', 'api', recorder=recorder)
+
+    client.contacts.get('inboxabc', 1)
+    client.contacts.get('inboxabc', '1')
+    recorder.close()
+
+    numeric, short = read_entries(path)
+    assert numeric['body']['created'] == short['body']['created'] == '2024-01-15 10:51'
+    assert numeric['body']['source_id'] == '1'
+    assert short['body']['source_id'] == '[REDACTED]'
+    assert short['endpoint'] == '/public/api/v1/inboxes/[REDACTED]/contacts/[REDACTED]'
+
+
+def test_recorder_never_breaks_the_call(standin, tmp_path):
+    server = standin(echo_route)
+    recorder = TrafficRecorder(str(tmp_path / 'traffic.ndjson'))
+    client = ChatwootSDK(server.url, 'platform', 'api', recorder=recorder)
+
+    assert client.users.get(object())['id'] == 7
+    recorder.file.close()
+    assert client.users.get(1)['id'] == 7
+    assert recorder.errors == 1
+
+
+def test_concurrent_calls_send_the_right_token(standin):
+    server = standin(echo_route)
+    client = ChatwootSDK(server.url, 'platform', 'api')
+    calls = [lambda: client.contacts.get('inbox', 'contact'), lambda: client.teams.list(1), lambda: client.users.get(1)] * 50
+
+    with ThreadPoolExecutor(16) as pool:
+        list(pool.map(lambda call: call(), calls))
+
+    for request in server.requests:
+        expected = {'public': None, 'api': 'api', 'platform': 'platform'}[request['path'].split('/')[1]]
+        assert request['headers'].get('api_access_token') == expected
+
+
+def test_replay_reproduces_recorded_traffic(standin, tmp_path):
+    server = standin(echo_route)
+    path = tmp_path / 'traffic.ndjson'
+    recorder = TrafficRecorder(str(path))
+    client = ChatwootSDK(server.url, 'platform', 'api', recorder=recorder)
+    client.teams.list(1)
+    client.contacts.update('inbox-ident', 'contact-ident', name='n')
+    recorder.close()
+
+    report = replay(str(path), concurrency=4, repeat=5)
+
+    assert report['calls'] == 10
+    assert report['phases']['transport'] > 0
+
+
+def test_profiler_logs_cache_hits(standin):
+    server = standin(echo_route)
+    client = ChatwootSDK(server.url, 'platform', 'api', profile=True, cache=LRUCache())
+
+    client.teams.list(1)
+    client.teams.list(1)
+
+    miss, hit = client.timings
+    assert not miss['cached'] and miss['transport'] > 0
+    assert hit['cached'] and hit['transport'] == 0.0 and hit['call'] == 'teams.list'
+    assert len(server.requests) == 1